@@ -8,6 +8,8 @@ from fastapi.middleware.cors import CORSMiddleware
 load_dotenv()
 
 stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
+# httpx-backed client so Stripe calls can be awaited and reuse connections
+stripe.default_http_client = stripe.HTTPXClient()
 
 app = FastAPI()
 
@@ -34,7 +36,7 @@ async def create_payment_intent(payment: PaymentRequest):
         raise HTTPException(status_code=400, detail="Amount must be positive")
 
     try:
-        intent = stripe.PaymentIntent.create(
+        intent = await stripe.PaymentIntent.create_async(
             amount=payment.amount,
             currency=payment.currency,
         )
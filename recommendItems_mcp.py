@@ -4,15 +4,21 @@ import re
 import traceback
 import sys
 import json
+import asyncio
+import threading
 from typing import Optional, List, Dict, Any
 import os
-from datetime import datetime
-from supabase import create_client, Client
+import httpx
+from supabase import acreate_client, AsyncClient, PostgrestAPIError
+from cachetools import TTLCache
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Verbose debug logging to stderr, enabled with SMARTCART_DEBUG=1/true/yes
+DEBUG = os.environ.get("SMARTCART_DEBUG", "").strip().lower() in ("1", "true", "yes")
+
 # Create the MCP server with debugging
 mcp = FastMCP("SmartCart")
 
@@ -22,10 +28,79 @@ keywords = {
 
 }
 
+# Plural to singular mappings applied to natural language queries
+PLURAL_TO_SINGULAR = {
+    "laptops": "laptop",
+    "notebooks": "notebook",
+    "keyboards": "keyboard",
+    "computers": "computer",
+    "monitors": "monitor",
+    "headphones": "headphone",
+    "speakers": "speaker",
+    "tablets": "tablet",
+    "phones": "phone",
+    "smartphones": "smartphone",
+    "printers": "printer",
+    "mice": "mouse",
+    "mouses": "mouse"
+}
+
+# Query parsing patterns, compiled once at import
+_PLURAL_RE = re.compile(
+    r'\b(?:' + '|'.join(map(re.escape, PLURAL_TO_SINGULAR)) + r')\b', re.IGNORECASE)
+# Count and price extraction in a single pass; the first match of each wins.
+# Every alternative is a lookahead, so a match consumes nothing and patterns
+# can overlap (in "under 5 products" the 5 is both a price and a count).
+# Word boundaries match _STRIP_RE so what is extracted is also stripped.
+_PARAMS_RE = re.compile(
+    r'(?=\b(?:show|find|get|display)\s+(?:me\s+)?(?P<lead_count>\d+)(?=\s|$))'
+    r'|(?=\b(?P<count>\d+)\s+(?:products|items)\b)'
+    r'|(?=\bunder\s+\$?(?P<price_max>\d+(?:\.\d+)?))'
+    r'|(?=\bover\s+\$?(?P<price_min>\d+(?:\.\d+)?))', re.IGNORECASE)
+# Everything that is not part of the topic: leading phrases (and a count
+# right after them), "N products/items", price bounds and qualifiers. A
+# number followed by products/items is left to the count alternative, and a
+# number is only a count when whitespace or the end follows it ("100%" is not).
+_STRIP_RE = re.compile(
+    r'^(?:show me|find me|get me|what are|recommend)\b'
+    r'(?:\s+\d+(?:\s+(?:products|items)\b|(?=\s|$)))?'
+    r'|\b\d+\s+(?:products|items)\b'
+    r'|\b(?:under|over)\s+\$?\d+(?:\.\d+)?\b(?!\s+(?:products|items)\b)'
+    r'|\b(?:the best|best-rated|affordable|good|great|top)\b', re.IGNORECASE)
+_WS_RE = re.compile(r'\s+')
+
+# Recent product lists keyed by search parameters. Products are cached rather
+# than formatted text so each response can carry its own session id.
+_CACHE = TTLCache(maxsize=1024, ttl=300)
+_CACHE_LOCK = threading.Lock()
+
+
+def _cache_key(topic: str, min_price: Optional[float], max_price: Optional[float], count: int) -> tuple:
+    """Canonical cache key so equivalent spellings of a search share an entry.
+
+    Case and whitespace are normalized because the title search ignores
+    case and the topic is whitespace-collapsed before querying. Word order
+    is kept since the substring search depends on it.
+    """
+    return (
+        topic.lower(),
+        None if min_price is None else round(float(min_price), 2),
+        None if max_price is None else round(float(max_price), 2),
+        count,
+    )
+
+
+if DEBUG:
+    def log_debug(message, *args):
+        """Log debug messages to stderr for MCP Inspector to capture.
 
-def log_debug(message):
-    """Log debug messages to stderr for MCP Inspector to capture"""
-    print(f"DEBUG: {message}", file=sys.stderr)
+        The message is %-formatted with args only here, so callers on hot
+        paths pay nothing for formatting when debugging is off.
+        """
+        print("DEBUG: " + (message % args if args else message), file=sys.stderr)
+else:
+    def log_debug(message, *args):
+        """Debug logging is disabled unless SMARTCART_DEBUG is set"""
 
 
 def log_error(message):
@@ -33,22 +108,55 @@ def log_error(message):
     print(f"ERROR: {message}", file=sys.stderr)
 
 # Initialize Supabase client with better error handling
+_supabase: Optional[AsyncClient] = None
+_supabase_lock = asyncio.Lock()
+
+# Connection pool for PostgREST: keep idle HTTP/2 connections around so
+# requests skip the TCP/TLS handshake and multiplex over one socket
+POSTGREST_LIMITS = httpx.Limits(
+    max_keepalive_connections=32, keepalive_expiry=60)
+POSTGREST_TIMEOUT = 10
+
 
+async def get_supabase_client() -> AsyncClient:
+    """Get or create a Supabase client instance with detailed error handling.
 
-def get_supabase_client() -> Client:
-    """Get or create a Supabase client instance with detailed error handling"""
+    The client is created once and shared so its underlying HTTP connection
+    pool is reused across tool calls instead of paying a fresh TCP/TLS
+    handshake each time.
+    """
+    global _supabase
+    if _supabase is not None:
+        return _supabase
+
+    async with _supabase_lock:
+        if _supabase is None:
+            _supabase = await _create_supabase_client()
+        return _supabase
+
+
+async def close_supabase_client() -> None:
+    """Close pooled database connections and drop the cached client"""
+    global _supabase
+    if _supabase is not None:
+        client, _supabase = _supabase, None
+        await client.postgrest.aclose()
+
+
+async def _create_supabase_client() -> AsyncClient:
+    """Create the async Supabase client from environment credentials"""
     try:
         supabase_url = os.environ.get("SUPABASE_URL")
         supabase_key = os.environ.get("SUPABASE_KEY")
 
         # Log partial credentials for debugging (safely)
         if supabase_url:
-            log_debug(f"Supabase URL: {supabase_url[:15]}...")
+            log_debug("Supabase URL: %.15s...", supabase_url)
         else:
             log_error("SUPABASE_URL environment variable is not set")
 
         if supabase_key:
-            log_debug(f"Supabase Key: {supabase_key[:5]}...")
+            log_debug("Supabase Key: %.5s...", supabase_key)
         else:
             log_error("SUPABASE_KEY environment variable is not set")
 
@@ -58,7 +166,8 @@ def get_supabase_client() -> Client:
 
         # Create client with error handling
         try:
-            client = create_client(supabase_url, supabase_key)
+            client = await acreate_client(supabase_url, supabase_key)
+            await _tune_postgrest_session(client)
             log_debug("Supabase client created successfully")
             return client
         except Exception as e:
@@ -67,13 +176,100 @@ def get_supabase_client() -> Client:
             raise
 
     except Exception as e:
-        log_error(f"Error in get_supabase_client: {str(e)}")
+        log_error(f"Error in _create_supabase_client: {str(e)}")
         log_error(traceback.format_exc())
         raise
 
 
+async def _tune_postgrest_session(client: AsyncClient) -> None:
+    """Swap the PostgREST HTTP session for one with a tuned connection pool"""
+    postgrest = client.postgrest
+    session = postgrest.session
+    postgrest.session = httpx.AsyncClient(
+        base_url=session.base_url,
+        headers=session.headers,
+        timeout=POSTGREST_TIMEOUT,
+        limits=POSTGREST_LIMITS,
+        follow_redirects=True,
+        http2=True,
+    )
+    await session.aclose()
+
+
+# Product searches waiting to be sent together, keyed by cache key. Searches
+# arriving within _BATCH_WINDOW seconds of each other share one RPC call.
+_BATCH_WINDOW = 0.005
+_pending: Dict[tuple, tuple] = {}
+_flush_tasks: set = set()
+
+
+async def _search_products(cache_key: tuple, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Queue a product search for the next batch and wait for its rows"""
+    loop = asyncio.get_running_loop()
+    if not _pending:
+        loop.call_later(_BATCH_WINDOW, _schedule_flush)
+
+    future = loop.create_future()
+    if cache_key in _pending:
+        _pending[cache_key][1].append(future)
+    else:
+        _pending[cache_key] = (params, [future])
+    return await future
+
+
+def _schedule_flush() -> None:
+    """Start sending the pending searches, keeping a reference to the task"""
+    task = asyncio.get_running_loop().create_task(_flush_pending())
+    _flush_tasks.add(task)
+    task.add_done_callback(_flush_tasks.discard)
+
+
+async def _flush_pending() -> None:
+    """Send all pending searches as one search_products_batch call.
+
+    Every waiting search is resolved before this returns, with its rows or
+    with the error that stopped the batch, so no caller is left hanging.
+    """
+    batch = list(_pending.values())
+    _pending.clear()
+    log_debug("Flushing %d batched product searches", len(batch))
+
+    error = None
+    try:
+        supabase = await get_supabase_client()
+        response = await supabase.rpc("search_products_batch", {
+            "queries": [params for params, _ in batch],
+        }).execute()
+
+        # One row per search, so a short response means searches were lost
+        results = [None] * len(batch)
+        for row in response.data:
+            idx = row["idx"]
+            if not 0 <= idx < len(results):
+                raise ValueError(f"Unexpected search index in batch: {idx}")
+            results[idx] = row["products"]
+        if None in results:
+            raise ValueError(
+                f"Batch returned results for {len(batch) - results.count(None)} "
+                f"of {len(batch)} searches")
+
+        for (_, futures), products in zip(batch, results):
+            for future in futures:
+                if not future.done():
+                    future.set_result(products)
+    except Exception as e:
+        log_error(f"Error in batched product search: {str(e)}")
+        error = e
+    finally:
+        for _, futures in batch:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(
+                        error or RuntimeError("Batched product search was interrupted"))
+
+
 @mcp.tool()
-def recommend_items(topic: str, price_range: Optional[List[float]] = None, count: Optional[int] = None) -> str:
+async def recommend_items(topic: str, price_range: Optional[List[float]] = None, count: Optional[int] = None) -> str:
     """
     Recommend products based on a topic, with optional price range and count filters.
 
@@ -86,10 +282,13 @@ def recommend_items(topic: str, price_range: Optional[List[float]] = None, count
         A formatted list of recommended products
     """
     # Debug input parameters
-    log_debug(
-        f"Function called with: topic='{topic}', price_range={price_range}, count={count}")
-    log_debug(
-        f"Parameter types: topic={type(topic)}, price_range={type(price_range)}, count={type(count)}")
+    log_debug("Function called with: topic='%s', price_range=%s, count=%s",
+              topic, price_range, count)
+    log_debug("Parameter types: topic=%s, price_range=%s, count=%s",
+              type(topic), type(price_range), type(count))
+
+    # Collapse whitespace so equivalent spellings search (and cache) the same
+    topic = _WS_RE.sub(' ', topic or '').strip()
 
     # Validate parameters
     if not topic:
@@ -99,139 +298,42 @@ def recommend_items(topic: str, price_range: Optional[List[float]] = None, count
     # Set defaults
     if count is None:
         count = 10
-        log_debug(f"Using default count: {count}")
+        log_debug("Using default count: %d", count)
 
-    try:
-        # Initialize Supabase client
-        log_debug("Initializing Supabase client...")
-        supabase = get_supabase_client()
+    # Only a max price, or a min price greater than 0, filters anything
+    min_price = max_price = None
+    if price_range and len(price_range) == 2:
+        if price_range[0] is not None and price_range[0] > 0:
+            min_price = price_range[0]
+        max_price = price_range[1]
 
-        # Test database connection with a simple query
-        try:
-            log_debug("Testing database connection...")
-            test_query = supabase.table("products").select(
-                "count").limit(1).execute()
-            log_debug(f"Database connection test successful: {test_query}")
-        except Exception as db_test_error:
-            log_error(f"Database connection test failed: {str(db_test_error)}")
-            log_error(traceback.format_exc())
-            return f"Error connecting to database: {str(db_test_error)}"
+    # Use a static session ID instead of creating a cart
+    session_id = "demo-session"
 
-        # Build query incrementally with checks
+    try:
+        # Serve repeated searches from the cache without touching the database
+        cache_key = _cache_key(topic, min_price, max_price, count)
+        with _CACHE_LOCK:
+            products = _CACHE.get(cache_key)
+        if products is not None:
+            log_debug("Cache hit for %s", cache_key)
+            return format_product_results(products, session_id)
+
+        # Filtering, ordering and limiting happen in the database, batched
+        # with any other searches made at the same time
         try:
-            log_debug("Building query...")
-
-            # Start with basic select
-            log_debug("Creating base query...")
-            query = supabase.table("products").select(
-                "productId, title, price, image, link, rating")
-
-            # Test base query
-            try:
-                base_result = query.limit(1).execute()
-                log_debug(
-                    f"Base query test successful: {len(base_result.data) if hasattr(base_result, 'data') else 'no data'} results")
-            except Exception as base_query_error:
-                log_error(f"Base query test failed: {str(base_query_error)}")
-                return f"Error with base query: {str(base_query_error)}"
-
-            # Add search filter
-            log_debug(f"Adding title filter: '%{topic}%'")
-            query = query.ilike("title", f"%{topic}%")
-
-            # Test with title filter
-            try:
-                title_result = query.limit(1).execute()
-                log_debug(
-                    f"Title filter test: {len(title_result.data) if hasattr(title_result, 'data') else 'no data'} results")
-            except Exception as title_error:
-                log_error(f"Title filter error: {str(title_error)}")
-                return f"Error with title filter: {str(title_error)}"
-
-            # Add price range filter if provided
-            if price_range and len(price_range) == 2:
-                log_debug(f"Adding price range filter: {price_range}")
-
-                if price_range[1] is not None:  # If max price is specified
-                    log_debug(f"Adding max price filter: <= {price_range[1]}")
-                    query = query.lte("price", price_range[1])
-
-                    # Test with max price
-                    try:
-                        max_price_result = query.limit(1).execute()
-                        log_debug(
-                            f"Max price filter test: {len(max_price_result.data) if hasattr(max_price_result, 'data') else 'no data'} results")
-                    except Exception as max_price_error:
-                        log_error(
-                            f"Max price filter error: {str(max_price_error)}")
-                        return f"Error with max price filter: {str(max_price_error)}"
-
-                if price_range[0] > 0:  # If min price is specified and greater than 0
-                    log_debug(f"Adding min price filter: >= {price_range[0]}")
-                    query = query.gte("price", price_range[0])
-
-                    # Test with min price
-                    try:
-                        min_price_result = query.limit(1).execute()
-                        log_debug(
-                            f"Min price filter test: {len(min_price_result.data) if hasattr(min_price_result, 'data') else 'no data'} results")
-                    except Exception as min_price_error:
-                        log_error(
-                            f"Min price filter error: {str(min_price_error)}")
-                        return f"Error with min price filter: {str(min_price_error)}"
-
-            # Add ordering
-            log_debug("Adding order clause: rating desc, price asc")
-            try:
-                # Try with just one ordering first to isolate any issues
-                query_with_rating_order = query.order("rating", desc=True)
-                rating_order_result = query_with_rating_order.limit(
-                    1).execute()
-                log_debug(f"Rating ordering test successful")
-
-                # Now add price ordering
-                query = query_with_rating_order.order("price", desc=False)
-
-                # Test full ordering
-                order_result = query.limit(1).execute()
-                log_debug(f"Full ordering test successful")
-
-            except Exception as order_error:
-                log_error(f"Order clause error: {str(order_error)}")
-                log_error(traceback.format_exc())
-                # Try to continue without ordering
-                log_debug("Continuing without ordering due to error")
-
-            # Limit the results
-            log_debug(f"Setting result limit: {count}")
-            query = query.limit(count)
-
-            # Execute final query
-            log_debug("Executing final query...")
-            response = query.execute()
-
-            # Debug response
-            log_debug(f"Query response type: {type(response)}")
-            log_debug(
-                f"Response has error attribute: {hasattr(response, 'error')}")
-            log_debug(
-                f"Response has data attribute: {hasattr(response, 'data')}")
-
-            if hasattr(response, 'data'):
-                log_debug(f"Data count: {len(response.data)}")
-
-            # Check for errors
-            if hasattr(response, 'error') and response.error is not None:
-                log_error(f"Error in query response: {response.error}")
-                return f"Error querying products: {response.error.message if hasattr(response.error, 'message') else str(response.error)}"
-
-            # Extract products
-            products = response.data if hasattr(response, 'data') else []
-            log_debug(f"Found {len(products)} matching products")
-
-            # Use a static session ID instead of creating a cart
-            session_id = "demo-session"
-            log_debug(f"Using static session ID: {session_id}")
+            log_debug("Searching products for '%s'", topic)
+            # Failed requests raise PostgrestAPIError
+            products = await _search_products(cache_key, {
+                "topic": topic,
+                "pmin": min_price,
+                "pmax": max_price,
+                "lim": max(count, 0),
+            })
+            log_debug("Found %d matching products", len(products))
+
+            with _CACHE_LOCK:
+                _CACHE[cache_key] = products
 
             # Format and return results
             log_debug("Formatting product results...")
@@ -239,6 +341,10 @@ def recommend_items(topic: str, price_range: Optional[List[float]] = None, count
             log_debug("Results formatted successfully")
             return result
 
+        except PostgrestAPIError as api_error:
+            log_error(f"Error in query response: {api_error.message}")
+            return f"Error querying products: {api_error.message}"
+
         except Exception as query_error:
             log_error(f"Error building or executing query: {str(query_error)}")
             log_error(traceback.format_exc())
@@ -253,28 +359,31 @@ def recommend_items(topic: str, price_range: Optional[List[float]] = None, count
 def format_product_results(products: List[Dict[str, Any]], session_id: str) -> str:
     """Format products into a readable output"""
     try:
-        log_debug(
-            f"Formatting {len(products)} products for session {session_id}")
+        log_debug("Formatting %d products for session %s",
+                  len(products), session_id)
 
         if not products:
             log_debug("No products found")
             return f"No products found matching your criteria. Session ID: {session_id}"
 
-        result = f"Here are your recommended products (Session ID: {session_id}):\n\n"
+        parts = [
+            f"Here are your recommended products (Session ID: {session_id}):\n\n"]
 
         for i, product in enumerate(products, 1):
             try:
-                log_debug(
-                    f"Formatting product {i}: {product.get('title', 'Unknown')[:20]}...")
+                get = product.get
+                log_debug("Formatting product %d: %.20s...",
+                          i, get('title', 'Unknown'))
 
-                title = product.get("title", "Unknown Product")
-                price = product.get("price", 0)
+                title = get("title", "Unknown Product")
+                price = get("price", 0)
                 price_formatted = f"${float(price):.2f}" if price is not None else "Price not available"
                 rating_text = ""
 
-                if product.get("rating") is not None:
+                rating = get("rating")
+                if rating is not None:
                     try:
-                        rating = float(product.get("rating"))
+                        rating = float(rating)
                         rating_text = f" | Rating: {rating:.1f}/5"
                     except (ValueError, TypeError) as rating_error:
                         log_error(
@@ -282,26 +391,24 @@ def format_product_results(products: List[Dict[str, Any]], session_id: str) -> s
                         rating_text = " | Rating: N/A"
 
                 # Create a short one-line summary
-                summary = title
-                if len(summary) > 60:
-                    summary = summary[:57] + "..."
-
-                result += f"{i}. **{title}**\n"
-                result += f"   Summary: {summary}\n"
-                result += f"   Price: {price_formatted}{rating_text}\n"
+                summary = title if len(title) <= 60 else title[:57] + "..."
 
-                if product.get("image"):
-                    result += f"   [Image]({product.get('image')})\n"
+                image = get("image")
+                image_text = f"   [Image]({image})\n" if image else ""
 
-                result += "\n"
+                parts.append(
+                    f"{i}. **{title}**\n"
+                    f"   Summary: {summary}\n"
+                    f"   Price: {price_formatted}{rating_text}\n"
+                    f"{image_text}\n")
 
             except Exception as product_error:
                 log_error(
                     f"Error formatting product {i}: {str(product_error)}")
-                result += f"{i}. **Error formatting product**\n\n"
+                parts.append(f"{i}. **Error formatting product**\n\n")
 
         log_debug("Product formatting complete")
-        return result
+        return "".join(parts)
 
     except Exception as format_error:
         log_error(f"Error in format_product_results: {str(format_error)}")
@@ -310,7 +417,7 @@ def format_product_results(products: List[Dict[str, Any]], session_id: str) -> s
 
 
 @mcp.tool()
-def recommend_items_from_query(query: str) -> str:
+async def recommend_items_from_query(query: str) -> str:
     """
     Parse a natural language query and recommend products based on extracted parameters.
 
@@ -321,22 +428,22 @@ def recommend_items_from_query(query: str) -> str:
         A formatted list of recommended products
     """
     try:
-        log_debug(f"Processing natural language query: '{query}'")
+        log_debug("Processing natural language query: '%s'", query)
 
         # Parse the query
         params = parse_query_parameters(query)
-        log_debug(f"Extracted parameters: {params}")
+        log_debug("Extracted parameters: %s", params)
 
         # Extract parameters
         topic = params.get("topic", "")
         price_range = params.get("price_range")
         count = params.get("count")
 
-        log_debug(
-            f"Calling recommend_items with: topic='{topic}', price_range={price_range}, count={count}")
+        log_debug("Calling recommend_items with: topic='%s', price_range=%s, count=%s",
+                  topic, price_range, count)
 
         # Call the main recommendation function
-        return recommend_items(topic, price_range, count)
+        return await recommend_items(topic, price_range, count)
 
     except Exception as e:
         log_error(f"Error in recommend_items_from_query: {str(e)}")
@@ -347,101 +454,52 @@ def recommend_items_from_query(query: str) -> str:
 def parse_query_parameters(query: str) -> Dict[str, Any]:
     """Parse natural language query to extract parameters"""
     try:
-        log_debug(f"Parsing query parameters from: '{query}'")
+        log_debug("Parsing query parameters from: '%s'", query)
         params = {"topic": "", "price_range": None, "count": None}
 
-        # Define plural to singular mappings
-        plural_to_singular = {
-            "laptops": "laptop",
-            "notebooks": "notebook",
-            "keyboards": "keyboard",
-            "computers": "computer",
-            "monitors": "monitor",
-            "headphones": "headphone",
-            "speakers": "speaker",
-            "tablets": "tablet",
-            "phones": "phone",
-            "smartphones": "smartphone",
-            "printers": "printer",
-            "mice": "mouse",
-            "mouses": "mouse"
-        }
-
         # Apply plural to singular mapping to the original query
         original_query = query
-        for plural, singular in plural_to_singular.items():
-            # Use regex with word boundaries to avoid partial matches
-            pattern = r'\b' + re.escape(plural) + r'\b'
-            query = re.sub(pattern, singular, query, flags=re.IGNORECASE)
+        query = _PLURAL_RE.sub(
+            lambda m: PLURAL_TO_SINGULAR[m.group(0).lower()], query)
 
         if original_query != query:
-            log_debug(f"Normalized query: '{original_query}' -> '{query}'")
+            log_debug("Normalized query: '%s' -> '%s'", original_query, query)
 
-        # Extract count
-        count_match = re.search(
-            r'(?:show|find|get|display)\s+(?:me\s+)?(\d+)', query, re.IGNORECASE)
-        if not count_match:
-            count_match = re.search(
-                r'(\d+)\s+(?:products|items)', query, re.IGNORECASE)
+        # Extract count and price bounds in one scan
+        found = {}
+        for match in _PARAMS_RE.finditer(query):
+            found.setdefault(match.lastgroup, match.group(match.lastgroup))
 
-        if count_match:
-            params["count"] = int(count_match.group(1))
-            log_debug(f"Extracted count: {params['count']}")
-
-        # Extract price range - both min and max price
-        price_max = re.search(
-            r'under\s+\$?(\d+(?:\.\d+)?)', query, re.IGNORECASE)
-        price_min = re.search(
-            r'over\s+\$?(\d+(?:\.\d+)?)', query, re.IGNORECASE)
+        count_text = found.get("lead_count") or found.get("count")
+        if count_text:
+            params["count"] = int(count_text)
+            log_debug("Extracted count: %d", params['count'])
 
         # Initialize with defaults
         min_price = 0
         max_price = None
 
         # Set min price if found
-        if price_min:
-            min_price = float(price_min.group(1))
-            log_debug(f"Found minimum price: ${min_price}")
+        if "price_min" in found:
+            min_price = float(found["price_min"])
+            log_debug("Found minimum price: $%s", min_price)
 
         # Set max price if found
-        if price_max:
-            max_price = float(price_max.group(1))
-            log_debug(f"Found maximum price: ${max_price}")
+        if "price_max" in found:
+            max_price = float(found["price_max"])
+            log_debug("Found maximum price: $%s", max_price)
 
         # Create price range if either min or max is specified
-        if price_min or price_max:
+        if "price_min" in found or "price_max" in found:
             params["price_range"] = [min_price, max_price]
-            log_debug(f"Set price range: {params['price_range']}")
-
-        # Extract topic by removing count and price patterns
-        topic_query = query
-
-        # Remove common question patterns
-        for pattern in [r'^show me', r'^find me', r'^get me', r'^what are', r'^recommend']:
-            topic_query = re.sub(pattern, '', topic_query, flags=re.IGNORECASE)
-
-        # Remove count and price patterns
-        if count_match:
-            topic_query = re.sub(r'\d+\s+(?:products|items)',
-                                 '', topic_query, flags=re.IGNORECASE)
-        if price_max:
-            topic_query = re.sub(r'under\s+\$?\d+(?:\.\d+)?',
-                                 '', topic_query, flags=re.IGNORECASE)
-        if price_min:
-            topic_query = re.sub(r'over\s+\$?\d+(?:\.\d+)?',
-                                 '', topic_query, flags=re.IGNORECASE)
-
-        # Remove qualifiers
-        for qualifier in ['the best', 'best-rated', 'affordable', 'good', 'great', 'top']:
-            topic_query = re.sub(
-                qualifier, '', topic_query, flags=re.IGNORECASE)
-
-        # Clean up and set topic
-        topic_query = re.sub(r'\s+', ' ', topic_query).strip()
+            log_debug("Set price range: %s", params['price_range'])
+
+        # Extract topic by stripping everything else in one pass
+        topic_query = _WS_RE.sub(' ', _STRIP_RE.sub('', query)).strip()
 
         if topic_query:
             params["topic"] = topic_query
-            log_debug(f"Final extracted topic: '{params['topic']}'")
+            log_debug("Final extracted topic: '%s'", params['topic'])
         else:
             log_debug("No topic extracted")
 
@@ -454,8 +512,20 @@ def parse_query_parameters(query: str) -> Dict[str, Any]:
         return {"topic": query, "price_range": None, "count": None}
 
 
+async def run_server() -> None:
+    """Run the MCP server over stdio, closing pooled connections at exit.
+
+    The pool lives for the whole process: it is shared by every client
+    session, so it is not torn down when an individual session ends.
+    """
+    try:
+        await mcp.run_stdio_async()
+    finally:
+        await close_supabase_client()
+
+
 # Main entry point
 if __name__ == "__main__":
     log_debug("Starting SmartCart MCP server...")
     # Run the MCP server
-    mcp.run()
+    asyncio.run(run_server())
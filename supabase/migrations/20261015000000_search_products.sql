@@ -0,0 +1,32 @@
+-- Product search used by the recommend_items MCP tool.
+--
+-- title ILIKE '%topic%' has a leading wildcard, so a B-tree index cannot
+-- serve it; a trigram GIN index can.
+create extension if not exists pg_trgm;
+
+create index if not exists products_title_trgm_idx
+    on products using gin (title gin_trgm_ops);
+
+create index if not exists products_rating_price_idx
+    on products (rating desc nulls last, price asc);
+
+-- Matching products, best rated first, then cheapest first.
+-- pmin and pmax are optional; null means no bound.
+create or replace function search_products(
+    topic text,
+    pmin numeric default null,
+    pmax numeric default null,
+    lim integer default 10
+)
+returns setof products
+language sql
+stable
+as $$
+    select *
+    from products
+    where title ilike '%' || topic || '%'
+      and (pmin is null or price >= pmin)
+      and (pmax is null or price <= pmax)
+    order by rating desc nulls last, price asc
+    limit lim;
+$$;
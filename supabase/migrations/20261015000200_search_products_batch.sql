@@ -0,0 +1,37 @@
+-- Several product searches in one call, so concurrent recommend_items
+-- requests can share a single round-trip.
+--
+-- queries is a JSON array of {"topic", "pmin", "pmax", "lim"} objects.
+-- Each search gets exactly one row: idx, the zero-based position of the
+-- search in that array, and products, a JSON array of the product fields
+-- the MCP server formats (empty when nothing matches). Returning one row
+-- per search keeps PostgREST's max-rows cap from truncating products.
+drop function if exists search_products_batch(jsonb);
+
+create function search_products_batch(queries jsonb)
+returns table (idx integer, products jsonb)
+language sql
+stable
+as $$
+    select
+        (q.ord - 1)::integer,
+        coalesce((
+            select jsonb_agg(
+                jsonb_build_object(
+                    'title', p.title,
+                    'price', p.price,
+                    'image', p.image,
+                    'rating', p.rating
+                )
+                order by p.rating desc nulls last, p.price asc
+            )
+            from search_products(
+                q.spec->>'topic',
+                (q.spec->>'pmin')::numeric,
+                (q.spec->>'pmax')::numeric,
+                (q.spec->>'lim')::integer
+            ) as p
+        ), '[]'::jsonb)
+    from jsonb_array_elements(queries) with ordinality as q(spec, ord)
+    order by q.ord;
+$$;
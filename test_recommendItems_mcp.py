@@ -0,0 +1,160 @@
+import asyncio
+
+import pytest
+
+import recommendItems_mcp as smartcart
+
+
+class StubResponse:
+    def __init__(self, data):
+        self.data = data
+
+
+class StubRPC:
+    def __init__(self, client, params):
+        self.client = client
+        self.params = params
+
+    async def execute(self):
+        self.client.calls.append(self.params)
+        await asyncio.sleep(0)
+        rows = self.client.respond(self.params["queries"])
+        # PostgREST truncates responses at max-rows without an error
+        return StubResponse(rows[:self.client.max_rows])
+
+
+class StubClient:
+    """Stands in for the Supabase client's search_products_batch RPC"""
+
+    def __init__(self, respond, max_rows=1000):
+        self.respond = respond
+        self.max_rows = max_rows
+        self.calls = []
+
+    def rpc(self, fn, params):
+        assert fn == "search_products_batch"
+        return StubRPC(self, params)
+
+
+def rows_per_topic(queries):
+    return [
+        {"idx": i, "products": [
+            {"title": f"{q['topic']} {n}", "price": 10, "rating": 4}
+            for n in range(q["lim"])
+        ]}
+        for i, q in enumerate(queries)
+    ]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    def install(respond=rows_per_topic, max_rows=1000):
+        stub = StubClient(respond, max_rows)
+        monkeypatch.setattr(smartcart, "_supabase", stub)
+        return stub
+
+    smartcart._CACHE.clear()
+    yield install
+    smartcart._CACHE.clear()
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("Show me 10 Nike shoes under $150",
+     {"topic": "Nike shoes", "price_range": [0, 150.0], "count": 10}),
+    ("find me the best laptops over $500 under 1000",
+     {"topic": "laptop", "price_range": [500.0, 1000.0], "count": None}),
+    ("Find laptop stands",
+     {"topic": "Find laptop stands", "price_range": None, "count": None}),
+    ("nike under 5 products",
+     {"topic": "nike under", "price_range": [0, 5.0], "count": 5}),
+    ("recommend 5 items great Headphones",
+     {"topic": "headphone", "price_range": None, "count": 5}),
+    ("show me 100% cotton shirts",
+     {"topic": "100% cotton shirts", "price_range": None, "count": None}),
+    ("thunder 5 speakers",
+     {"topic": "thunder 5 speaker", "price_range": None, "count": None}),
+    ("show me 3",
+     {"topic": "", "price_range": None, "count": 3}),
+])
+def test_parse_query_parameters(query, expected):
+    assert smartcart.parse_query_parameters(query) == expected
+
+
+async def gather_recommendations(*searches):
+    return await asyncio.wait_for(
+        asyncio.gather(*(smartcart.recommend_items(*args) for args in searches)), 2)
+
+
+def test_concurrent_searches_share_one_batch_call(client):
+    stub = client()
+    results = asyncio.run(gather_recommendations(
+        ("Nike shoes",), ("Adidas", [10, 50], 2)))
+
+    assert len(stub.calls) == 1
+    queries = stub.calls[0]["queries"]
+    assert [q["topic"] for q in queries] == ["Nike shoes", "Adidas"]
+    assert queries[1] == {"topic": "Adidas", "pmin": 10, "pmax": 50, "lim": 2}
+    assert "Nike shoes 0" in results[0] and "Adidas" not in results[0]
+    assert "Adidas 1" in results[1] and "Nike" not in results[1]
+
+
+def test_identical_searches_share_one_batch_entry(client):
+    stub = client()
+    results = asyncio.run(gather_recommendations(
+        ("Nike shoes",), ("nike   SHOES",)))
+
+    assert len(stub.calls) == 1
+    assert len(stub.calls[0]["queries"]) == 1
+    assert results[0] == results[1]
+
+
+def test_failed_batch_resolves_every_waiter(client):
+    client(lambda queries: [{"idx": 0}])
+    results = asyncio.run(gather_recommendations(("Nike shoes",), ("Adidas",)))
+
+    assert all(result.startswith("Error building query") for result in results)
+    assert not smartcart._CACHE
+
+
+def test_batch_products_are_not_cut_by_max_rows(client):
+    stub = client(max_rows=5)
+    searches = [(f"topic {n}", None, 3) for n in range(5)]
+    results = asyncio.run(gather_recommendations(*searches))
+
+    assert len(stub.calls) == 1
+    for n, result in enumerate(results):
+        assert f"3. **topic {n} 2**" in result
+
+
+def test_truncated_batch_is_an_error_and_not_cached(client):
+    client(max_rows=2)
+    searches = [(f"topic {n}",) for n in range(3)]
+    results = asyncio.run(gather_recommendations(*searches))
+
+    assert all(result.startswith("Error building query") for result in results)
+    assert not smartcart._CACHE
+
+
+class StubPostgrest:
+    def __init__(self):
+        self.closed = False
+
+    async def aclose(self):
+        self.closed = True
+
+
+def test_server_closes_pool_only_at_exit(monkeypatch):
+    stub = StubClient(rows_per_topic)
+    stub.postgrest = StubPostgrest()
+    monkeypatch.setattr(smartcart, "_supabase", stub)
+
+    async def serve():
+        # Client sessions come and go while the server runs
+        assert smartcart._supabase is stub
+        assert not stub.postgrest.closed
+
+    monkeypatch.setattr(smartcart.mcp, "run_stdio_async", serve)
+    asyncio.run(smartcart.run_server())
+
+    assert smartcart._supabase is None
+    assert stub.postgrest.closed